@@ -3,7 +3,7 @@ io_driver.py
 
 Encapsulates io logic. Both printing stat_analysis data to console and saving it to json file.
 """
-import io
+import sys
 from contextlib import redirect_stdout
 from pathlib import Path
 
@@ -12,6 +12,28 @@ import json
 
 import pandas as pd
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class _Tee:
+    """
+    Minimal writable object that forwards writes to several streams, so printed output
+    reaches the console and the results file in a single pass.
+    """
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, s):
+        for stream in self.streams:
+            stream.write(s)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
 
 def _print_df(df, floatfmt=".3f"):
     """
@@ -31,9 +53,8 @@ def pretty_print(results, out_dir, filename="results.txt"):
     :param filename: name of the file to be saved.
     :return: None
     """
-    buf = io.StringIO()
-
-    with redirect_stdout(buf):
+    out_path = Path(out_dir) / filename
+    with out_path.open("w", encoding="utf-8") as fh, redirect_stdout(_Tee(sys.stdout, fh)):
         print("\n--- Summary statistics (raw seconds) ---")
         _print_df(results["summary"])
         print("\n--- Summary statistics (log10 scale) ---")
@@ -74,12 +95,6 @@ def pretty_print(results, out_dir, filename="results.txt"):
         print(results["bootstrap"]["median_ratio_ci"])
         print(results["bootstrap"]["mean_log10_factor_ci"])
 
-    text = buf.getvalue()
-    print(text, end="")
-
-    out_path = Path(out_dir) / filename
-    out_path.write_text(text, encoding="utf-8")
-
 
 def _make_json(obj):
     """
@@ -110,5 +125,11 @@ def save_json(results, out_dir, filename="analysis.json"):
     """
     json_obj = _make_json(results)
     path = Path(out_dir) / filename
-    with path.open("w", encoding="utf8") as f:
-        json.dump(json_obj, f, indent=2)
+    if orjson is not None:
+        # orjson encodes natively in Rust and the bytes go out in a single write;
+        # OPT_NON_STR_KEYS covers Series indexed by non-string keys.
+        path.write_bytes(orjson.dumps(
+            json_obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS))
+    else:
+        # json.dumps + one write avoids json.dump's per-token write() calls.
+        path.write_text(json.dumps(json_obj, indent=2), encoding="utf8")
@@ -0,0 +1,28 @@
+"""
+numeric_utils.py
+
+Shared numeric helpers used across reconstruction, statistics and plotting.
+"""
+import numpy as np
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+# Below this size the numexpr setup cost outweighs the fused kernel.
+_NUMEXPR_MIN_SIZE = 10_000
+
+
+def log10p1(x):
+    """
+    Compute log10(x + 1) elementwise. On large arrays numexpr, when installed, fuses
+    the add and the log10 into one chunked multithreaded kernel with no intermediate
+    array; plain NumPy is used otherwise.
+    :param x: array-like of values.
+    :return: ndarray of log10(x + 1).
+    """
+    x = np.asarray(x)
+    if numexpr is not None and x.size >= _NUMEXPR_MIN_SIZE:
+        return numexpr.evaluate("log10(x + 1.0)")
+    return np.log10(x + 1.0)
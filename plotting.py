@@ -6,121 +6,130 @@ Encapsulates logic for generating plots. Data is visualized through:
     - Boxplot (log10)
     - Boxplot of per user medians (log10)
     - Violin
+
+matplotlib/seaborn are imported lazily so the no-plots CLI path never pays their
+import cost; the plot functions draw on a shared Axes owned by plot_all.
 """
 from pathlib import Path
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 
+from numeric_utils import log10p1
+
 
-def plot_hist_log10(episodes_df, out_dir, out_file_name="duration_hist_log10.png", bins=50):
+def _save_and_clear(ax, out_dir, out_file_name):
+    """
+    Save the Axes' figure to out_dir and clear the Axes for the next plot.
+    :param ax: Axes the plot was drawn on.
+    :param out_dir: directory where to save plot image.
+    :param out_file_name: file name for saving plot image.
+    :return: None
+    """
+    ax.figure.tight_layout()
+    ax.figure.savefig(str(Path(out_dir) / out_file_name))
+    ax.clear()
+
+
+def plot_hist_log10(ep_df, out_dir, ax, out_file_name="duration_hist_log10.png", bins=50):
     """
     Histogram of log10(duration_sec + 1) for manual vs auto.
-    :param episodes_df: DataFrame containing episodes. Must contain: open_type, duration_sec.
+    :param ep_df: DataFrame of episodes already cleaned by plot_all. Must contain: open_type, duration_sec.
     :param out_dir: directory where to save plot image.
+    :param ax: Axes to draw on.
     :param out_file_name: file name (default 'duration_hist_log10.png') for saving plot image.
     :param bins: bins (default 50) for histogram.
     :return: None
     """
-    ep_df = episodes_df.dropna(subset=["open_type", "duration_sec"])
-    if ep_df.empty:
-        raise ValueError("No episodes with 'open_type'/'duration_sec' found.")
-    plt.figure(figsize=(8, 5))
-
+    # Shared edges from one np.histogram_bin_edges call keep the groups comparable
+    # and skip the per-group binning seaborn would redo.
+    vals = ep_df["duration_log10_sec"].to_numpy()
+    edges = np.histogram_bin_edges(vals, bins=bins)
     for o_type in ep_df["open_type"].unique():
-        subset = ep_df[ep_df["open_type"] == o_type]
-        sns.histplot(subset["duration_log10_sec"], bins=bins, stat="density",
-                     element="step", label=o_type, alpha=0.6)
-    plt.xlabel("log10(duration_sec + 1)")
-    plt.title("Histogram (log10) by open_type")
-    plt.legend(title="open_type")
-    plt.tight_layout()
-    out_path = Path(out_dir) / out_file_name
-    plt.savefig(str(out_path))
-    plt.close()
-
-
-def plot_boxplot_log10(episodes_df, out_dir, out_file_name="duration_boxplot_log10.png"):
+        subset = ep_df.loc[ep_df["open_type"] == o_type, "duration_log10_sec"].to_numpy()
+        density, _ = np.histogram(subset, bins=edges, density=True)
+        ax.stairs(density, edges, label=o_type, alpha=0.6, fill=True)
+    ax.set_xlabel("log10(duration_sec + 1)")
+    ax.set_ylabel("Density")
+    ax.set_title("Histogram (log10) by open_type")
+    ax.legend(title="open_type")
+    _save_and_clear(ax, out_dir, out_file_name)
+
+
+def plot_boxplot_log10(ep_df, out_dir, ax, out_file_name="duration_boxplot_log10.png"):
     """
     Boxplot of log10(duration_sec + 1) for manual vs auto.
-    :param episodes_df: DataFrame containing episodes. Must contain: open_type, duration_sec.
+    :param ep_df: DataFrame of episodes already cleaned by plot_all. Must contain: open_type, duration_sec.
     :param out_dir: directory where to save plot image.
+    :param ax: Axes to draw on.
     :param out_file_name: file name (default 'duration_boxplot_log10.png') for saving plot image.
     :return: None
     """
-    ep_df = episodes_df.dropna(subset=["open_type", "duration_sec"])
-    if ep_df.empty:
-        raise ValueError("No episodes with 'open_type'/'duration_sec' found.")
+    import seaborn as sns
 
-    plt.figure(figsize=(6, 5))
-    sns.boxplot(x="open_type", y="duration_log10_sec", data=ep_df)
-    plt.xlabel("open_type")
-    plt.ylabel("log10(duration_sec + 1)")
-    plt.title("Boxplot duration (log10) by open_type")
-    plt.tight_layout()
-    out_path = Path(out_dir) / out_file_name
-    plt.savefig(str(out_path))
-    plt.close()
+    sns.boxplot(x="open_type", y="duration_log10_sec", data=ep_df, ax=ax)
+    ax.set_xlabel("open_type")
+    ax.set_ylabel("log10(duration_sec + 1)")
+    ax.set_title("Boxplot duration (log10) by open_type")
+    _save_and_clear(ax, out_dir, out_file_name)
 
 
-def plot_per_user_median_boxplot(episodes_df, out_dir, out_file_name="boxplot_per_user_median_log10.png"):
+def plot_per_user_median_boxplot(ep_df, out_dir, ax, out_file_name="boxplot_per_user_median_log10.png"):
     """
     Boxplot of per-user median log10 duration grouped by open_type.
-    :param episodes_df: DataFrame containing episodes. Must contain: user_id, open_type, duration_sec.
+    :param ep_df: DataFrame of episodes already cleaned by plot_all. Must contain: user_id, open_type, duration_sec.
     :param out_dir: directory where to save plot image.
+    :param ax: Axes to draw on.
     :param out_file_name: file name (default 'boxplot_per_user_median_log10.png') for saving plot image.
     :return: None
     """
-    ep_df = episodes_df.dropna(subset=["user_id", "open_type", "duration_sec"])
-    if ep_df.empty:
-        raise ValueError("No episodes with 'user_id'/'open_type'/'duration_sec' found.")
+    import seaborn as sns
 
-    per_user = ep_df.groupby(["user_id", "open_type"], as_index=False)["duration_sec"].median()
-    per_user["log10_median"] = np.log10(per_user["duration_sec"] + 1)
+    per_user = ep_df.groupby(["user_id", "open_type"], as_index=False, observed=True)["duration_sec"].median()
+    per_user["log10_median"] = log10p1(per_user["duration_sec"])
 
-    plt.figure(figsize=(6, 5))
-    sns.boxplot(x="open_type", y="log10_median", data=per_user)
-    plt.xlabel("open_type")
-    plt.ylabel("log10(per-user median duration_sec + 1)")
-    plt.title("Per-user median duration (log10) by open_type")
-    plt.tight_layout()
-    out_path = Path(out_dir) / out_file_name
-    plt.savefig(str(out_path))
-    plt.close()
+    sns.boxplot(x="open_type", y="log10_median", data=per_user, ax=ax)
+    ax.set_xlabel("open_type")
+    ax.set_ylabel("log10(per-user median duration_sec + 1)")
+    ax.set_title("Per-user median duration (log10) by open_type")
+    _save_and_clear(ax, out_dir, out_file_name)
 
 
-def plot_violin_log10(episodes_df, out_dir, out_file_name="duration_violin_log10.png", cut=2):
+def plot_violin_log10(ep_df, out_dir, ax, out_file_name="duration_violin_log10.png", cut=2):
     """
     Violin plot of log10(duration_sec + 1) by open_type.
-    :param episodes_df: DataFrame containing episodes. Must contain: open_type, duration_sec.
+    :param ep_df: DataFrame of episodes already cleaned by plot_all. Must contain: open_type, duration_sec.
     :param out_dir: directory where to save plot image.
+    :param ax: Axes to draw on.
     :param out_file_name: file name (default 'violin_log10.png') for saving plot image.
     :param cut: cut for violin plot.
     :return: None
     """
-    ep_df = episodes_df.dropna(subset=["user_id", "open_type", "duration_sec"])
-    if ep_df.empty:
-        raise ValueError("No episodes with 'user_id'/'open_type'/'duration_sec' found.")
+    import seaborn as sns
 
-    plt.figure(figsize=(6, 5))
-    sns.violinplot(x="open_type", y="duration_log10_sec", data=ep_df, cut=cut)
-    plt.xlabel("open_type")
-    plt.ylabel("log10(duration_sec + 1)")
-    plt.title("Violin plot (log10) by open_type")
-    plt.tight_layout()
-    out_path = Path(out_dir) / out_file_name
-    plt.savefig(str(out_path))
-    plt.close()
+    sns.violinplot(x="open_type", y="duration_log10_sec", data=ep_df, cut=cut, ax=ax)
+    ax.set_xlabel("open_type")
+    ax.set_ylabel("log10(duration_sec + 1)")
+    ax.set_title("Violin plot (log10) by open_type")
+    _save_and_clear(ax, out_dir, out_file_name)
 
 
 def plot_all(episodes_df, out_dir):
     """
-    Runs plot_hist_log10, plot_boxplot_log10, plot_per_user_median_log10, plot_violin_log10.
+    Runs plot_hist_log10, plot_boxplot_log10, plot_per_user_median_log10, plot_violin_log10
+    on one shared figure.
     :param episodes_df: DataFrame containing episodes. Must contain: user_id, open_type, duration_sec.
     :param out_dir: directory where to save plot images.
     :return: None
     """
-    plot_hist_log10(episodes_df, out_dir)
-    plot_boxplot_log10(episodes_df, out_dir)
-    plot_per_user_median_boxplot(episodes_df, out_dir)
-    plot_violin_log10(episodes_df, out_dir)
+    import matplotlib.pyplot as plt
+
+    ep_df = episodes_df.dropna(subset=["user_id", "open_type", "duration_sec"])
+    if ep_df.empty:
+        raise ValueError("No episodes with 'user_id'/'open_type'/'duration_sec' found.")
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    plot_hist_log10(ep_df, out_dir, ax)
+    fig.set_size_inches(6, 5)
+    plot_boxplot_log10(ep_df, out_dir, ax)
+    plot_per_user_median_boxplot(ep_df, out_dir, ax)
+    plot_violin_log10(ep_df, out_dir, ax)
+    plt.close(fig)
@@ -6,11 +6,16 @@ Encapsulates reconstruction logic. Uses EpisodeType Enum to mark episodes as eit
     - DOUBLE_OPEN
     - ORPHAN_OPEN
     - ORPHAN_CLOSE
+
+Reconstruction is a single vectorized NumPy pass over the sorted event arrays, so no
+per-row Python interpretation (and no JIT dependency) is involved.
 """
 from enum import Enum
 import pandas as pd
 import numpy as np
 
+from numeric_utils import log10p1
+
 
 class EpisodeType(str, Enum):
     REGULAR = "regular"
@@ -19,71 +24,75 @@ class EpisodeType(str, Enum):
     ORPHAN_CLOSE = "orphan_close"
 
 
-def append_episode(episodes, user_id, open_event, close_event, episode_type):
-    """
-    Helper function to add an episode entry to the episodes list.
-    :param episodes: List of episodes, containing 'user_id', 'open_timestamp', 'close_timestamp', 'open_type' and 'episode_type'.
-    :param user_id: id of user whose episode entry is to be added.
-    :param open_event: event that starts the episode being added.
-    :param close_event: event that ends the episode being added.
-    :param episode_type: EpisodeType.
-    :return: None
-    """
-    episodes.append({
-        "user_id": user_id,
-        "open_timestamp": open_event["timestamp"] if open_event is not None else None,
-        "close_timestamp": close_event["timestamp"] if close_event is not None else None,
-        "open_type": open_event["open_type"] if open_event is not None else None,
-        "episode_type": episode_type,
-    })
-
-
-def reconstruct_user_episodes(user_id, user_events):
-    """
-    Reconstruct episodes for a single user.
-    :param user_id: id of user whose episodes are to be reconstructed.
-    :param user_events: events being reconstructed.
-    :return: List of episode entries.
-    """
-    episodes = []
-    last_open_event = None
-
-    for _, row in user_events.iterrows():
-        # print(f"\t{row['event']} {row['datetime']} {row['open_type']}")
-        if row["event"] == "opened":
-            if last_open_event is not None:
-                # double opened event
-                append_episode(episodes, user_id, last_open_event, row, EpisodeType.DOUBLE_OPEN)
-            last_open_event = row
-        elif row["event"] == "closed":
-            if last_open_event is not None:
-                # regular open-close episode
-                append_episode(episodes, user_id, last_open_event, row, EpisodeType.REGULAR)
-                last_open_event = None
-            else:
-                # orphan closed event
-                append_episode(episodes, user_id, None, row, EpisodeType.ORPHAN_CLOSE)
-
-    if last_open_event is not None:
-        # Opened event at the end
-        append_episode(episodes, user_id, last_open_event, None, EpisodeType.ORPHAN_OPEN)
-
-    return episodes
-
-
 def reconstruct_all_episodes(dataset_df):
     """
-    Reconstruct all episodes from dataset.
+    Reconstruct all episodes from dataset in one vectorized pass over the sorted event
+    arrays, treating user boundaries as segment breaks. After any event the pending-open
+    flag equals "that event was an open", so the open paired with an episode emitted at
+    event i is always event i-1.
     :param dataset_df: Dataframe containing all data from the dataset.
     :return: DataFrame containing all episode entries.
     """
-    all_episodes = []
     dataset_df = dataset_df.sort_values(["user_id", "timestamp"]).reset_index(drop=True)
-    for user_id, group in dataset_df.groupby("user_id"):
-        # print(f"\nUser {user_id}:")
-        user_episodes = reconstruct_user_episodes(user_id, group)
-        all_episodes.extend(user_episodes)
-    return pd.DataFrame(all_episodes)
+    uid = dataset_df["user_id"].to_numpy()
+    ts = dataset_df["timestamp"].to_numpy()
+    otype = dataset_df["open_type"].to_numpy()
+    # Comparing the Series first keeps the event match on categorical codes when the
+    # column was loaded as category.
+    is_open = (dataset_df["event"] == "opened").to_numpy()
+    is_close = (dataset_df["event"] == "closed").to_numpy()
+    same_user = np.r_[False, uid[1:] == uid[:-1]]
+    last_of_user = np.r_[uid[1:] != uid[:-1], len(uid) > 0]
+
+    # An open is pending before event i exactly when event i-1 was an open by the same user.
+    prev_open = np.r_[False, is_open[:-1]] & same_user
+    is_double_open = is_open & prev_open
+    is_regular = is_close & prev_open
+    is_orphan_close = is_close & ~prev_open
+    # Opens still pending at the end of a user's events.
+    is_orphan_open = is_open & last_of_user
+
+    # Episodes emitted while scanning the events are ordered by event index; an orphan
+    # open shares the index of its user's last event and sorts after episodes emitted
+    # there. Preallocate the output arrays and scatter each class straight into its slot,
+    # computed from the running count of episodes emitted before each event.
+    emitted = is_double_open | is_regular | is_orphan_close
+    idx = np.flatnonzero(emitted)
+    oo_idx = np.flatnonzero(is_orphan_open)
+    has_open = ~is_orphan_close[idx]
+    prev_idx = np.maximum(idx - 1, 0)
+    emits_before = np.r_[0, np.cumsum(emitted.astype(np.int64) + is_orphan_open)[:-1]]
+    pos = emits_before[idx]
+    oo_pos = emits_before[oo_idx] + emitted[oo_idx]
+
+    n_episodes = len(idx) + len(oo_idx)
+    user_id = np.empty(n_episodes, dtype=uid.dtype)
+    open_ts = np.empty(n_episodes, dtype="float64")
+    close_ts = np.empty(n_episodes, dtype="float64")
+    open_type = np.empty(n_episodes, dtype=object)
+    episode_type = np.empty(n_episodes, dtype=object)
+
+    user_id[pos] = uid[idx]
+    open_ts[pos] = np.where(has_open, ts[prev_idx].astype("float64"), np.nan)
+    close_ts[pos] = ts[idx].astype("float64")
+    open_type[pos] = np.where(has_open, otype[prev_idx], None)
+    episode_type[pos[is_double_open[idx]]] = EpisodeType.DOUBLE_OPEN
+    episode_type[pos[is_regular[idx]]] = EpisodeType.REGULAR
+    episode_type[pos[is_orphan_close[idx]]] = EpisodeType.ORPHAN_CLOSE
+
+    user_id[oo_pos] = uid[oo_idx]
+    open_ts[oo_pos] = ts[oo_idx]
+    close_ts[oo_pos] = np.nan
+    open_type[oo_pos] = otype[oo_idx]
+    episode_type[oo_pos] = EpisodeType.ORPHAN_OPEN
+
+    return pd.DataFrame({
+        "user_id": user_id,
+        "open_timestamp": open_ts,
+        "close_timestamp": close_ts,
+        "open_type": open_type,
+        "episode_type": episode_type,
+    })
 
 
 def read_and_reconstruct_episodes(df):
@@ -92,12 +101,19 @@ def read_and_reconstruct_episodes(df):
     :param df: DataFrame containing all data from the dataset.
     :return: DataFrame containing all regular episodes.
     """
-    # Add 'datetime' column to dataset
-    df["datetime"] = pd.to_datetime(df["timestamp"], unit="ms")
-
     episodes_df = reconstruct_all_episodes(df)
 
-    episodes_df["duration_ms"] = episodes_df["close_timestamp"] - episodes_df["open_timestamp"]
-    episodes_df["duration_sec"] = episodes_df["duration_ms"] / 1000
-    episodes_df["duration_log10_sec"] = np.log10(episodes_df["duration_sec"] + 1)
+    # Categorical codes make the episode_type/open_type comparisons and groupbys
+    # downstream integer ops instead of per-row string compares.
+    episodes_df["episode_type"] = episodes_df["episode_type"].astype(
+        pd.CategoricalDtype(categories=[e.value for e in EpisodeType]))
+    episodes_df["open_type"] = episodes_df["open_type"].astype("category")
+
+    # The timestamp columns are float64 with NaN for orphan episodes, so the duration
+    # math runs once on the raw arrays instead of through per-column Series ops.
+    duration_ms = episodes_df["close_timestamp"].to_numpy() - episodes_df["open_timestamp"].to_numpy()
+    duration_sec = duration_ms / 1000.0
+    episodes_df["duration_ms"] = duration_ms
+    episodes_df["duration_sec"] = duration_sec
+    episodes_df["duration_log10_sec"] = log10p1(duration_sec)
     return episodes_df
@@ -9,28 +9,43 @@ Encapsulates statistics analysis. Includes methods for:
     - Bootstrap CI.
 """
 import numpy as np
+import pandas as pd
 from scipy import stats
 
+from numeric_utils import log10p1
 
-def stat_summary(episodes_df):
+
+def _prepare_episodes(episodes_df):
     """
-    Compute descriptive summaries of episode durations [sec], on raw (count, median, q25, q75, mean) and log10 scale (count, mean, std).
+    Drop episodes missing the analyzed columns and ensure the log10 duration column,
+    once for all downstream analysis functions.
     :param episodes_df: DataFrame containing all episodes.
-    :return: dict containing 'summary' and 'summary_log10'.
+    :return: cleaned DataFrame with 'duration_log10_sec' present.
     """
-    ep_df = episodes_df.dropna(subset=["open_type", "duration_sec"]).copy()
+    ep_df = episodes_df.dropna(subset=["user_id", "open_type", "duration_sec"]).copy()
     if "duration_log10_sec" not in ep_df.columns:
-        ep_df["duration_log10_sec"] = np.log10(ep_df["duration_sec"] + 1)
+        ep_df["duration_log10_sec"] = log10p1(ep_df["duration_sec"].to_numpy())
+    return ep_df
 
-    summary = ep_df.groupby("open_type")["duration_sec"].agg(
-        n="count",
-        median="median",
-        q25=lambda x: np.percentile(x, 25),
-        q75=lambda x: np.percentile(x, 75),
-        mean="mean"
-    ).reset_index()
 
-    summary_log10 = ep_df.groupby("open_type")["duration_log10_sec"].agg(
+def stat_summary(ep_df):
+    """
+    Compute descriptive summaries of episode durations [sec], on raw (count, median, q25, q75, mean) and log10 scale (count, mean, std).
+    :param ep_df: DataFrame of episodes prepared by _prepare_episodes.
+    :return: dict containing 'summary' and 'summary_log10'.
+    """
+    grouped = ep_df.groupby("open_type", observed=True)["duration_sec"]
+    quantiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    summary = pd.DataFrame({
+        "open_type": quantiles.index,
+        "n": grouped.count().to_numpy(),
+        "median": quantiles[0.5].to_numpy(),
+        "q25": quantiles[0.25].to_numpy(),
+        "q75": quantiles[0.75].to_numpy(),
+        "mean": grouped.mean().to_numpy(),
+    })
+
+    summary_log10 = ep_df.groupby("open_type", observed=True)["duration_log10_sec"].agg(
         n="count",
         mean="mean",
         sd="std"
@@ -42,25 +57,20 @@ def stat_summary(episodes_df):
     }
 
 
-def inferential_tests(episodes_df):
+def inferential_tests(ep_df, is_auto, is_manual):
     """
     Run episode-level inferential tests comparing duration [sec] distributions between open types.
-    :param episodes_df: DataFrame containing all episodes.
+    :param ep_df: DataFrame of episodes prepared by _prepare_episodes.
+    :param is_auto: boolean mask of episodes with open_type 'auto'.
+    :param is_manual: boolean mask of episodes with open_type 'manual'.
     :return: dict containing 'welch_t_test' and 'mann_whitney'.
     """
-    ep_df = episodes_df.dropna(subset=["open_type", "duration_sec"]).copy()
-    if "duration_log10_sec" not in ep_df.columns:
-        ep_df["duration_log10_sec"] = np.log10(ep_df["duration_sec"] + 1)
-
-    auto_log10 = ep_df.loc[ep_df["open_type"] == "auto", "duration_log10_sec"].dropna()
-    manual_log10 = ep_df.loc[ep_df["open_type"] == "manual", "duration_log10_sec"].dropna()
+    log10_vals = ep_df["duration_log10_sec"].to_numpy()
+    t_res = stats.ttest_ind(log10_vals[is_auto], log10_vals[is_manual], equal_var=False)
 
-    t_res = stats.ttest_ind(auto_log10, manual_log10, equal_var=False)
-
-    auto_raw = ep_df.loc[ep_df["open_type"] == "auto", "duration_sec"].dropna()
-    manual_raw = ep_df.loc[ep_df["open_type"] == "manual", "duration_sec"].dropna()
-    mw_res = stats.mannwhitneyu(auto_raw,
-                                manual_raw,
+    raw_vals = ep_df["duration_sec"].to_numpy()
+    mw_res = stats.mannwhitneyu(raw_vals[is_auto],
+                                raw_vals[is_manual],
                                 alternative="two-sided")
 
     return {
@@ -69,28 +79,34 @@ def inferential_tests(episodes_df):
     }
 
 
-def tail_test(episodes_df):
+def tail_test(ep_df):
     """
     Compute diagnostics for the extreme right tail of episode durations [sec].
-    :param episodes_df: DataFrame containing all episodes.
+    :param ep_df: DataFrame of episodes prepared by _prepare_episodes.
     :return: dict containing 'threshold_sec', 'tail_counts', 'total_sum', 'top_sum', 'percent_sum', 'tail_users', 'all_users', 'percent_tail_users' and 'top_user_contrib'.
     """
-    ep_df = episodes_df.dropna(subset=["user_id", "open_type", "duration_sec"]).copy()
-
-    threshold = np.percentile(ep_df["duration_sec"], 99)
+    # Selecting the order statistic with np.partition is O(n), unlike the full sort
+    # behind np.percentile; the threshold is then an observed duration rather than an
+    # interpolated one, which can admit at most one extra duration into the tail.
+    durations = ep_df["duration_sec"].to_numpy()
+    k = int(np.ceil(0.99 * len(durations))) - 1
+    threshold = np.partition(durations, k)[k]
     tail = ep_df[ep_df["duration_sec"] >= threshold]
 
-    total_sum_by_open_type = ep_df.groupby("open_type")["duration_sec"].sum()
-    top_sum_by_open_type = tail.groupby("open_type")["duration_sec"].sum()
+    total_sum_by_open_type = ep_df.groupby("open_type", observed=True)["duration_sec"].sum()
+    top_sum_by_open_type = tail.groupby("open_type", observed=True)["duration_sec"].sum()
     percent_top_sum_out_of_total = (top_sum_by_open_type / total_sum_by_open_type * 100).fillna(0)
 
+    # value_counts on the categorical column lists every category; keep only open
+    # types actually present in the tail, as with the previous object column.
     tail_counts = tail["open_type"].value_counts()
+    tail_counts = tail_counts[tail_counts > 0]
     tail_users = tail["user_id"].unique()
     all_users = ep_df["user_id"].unique()
     percent_of_top_users = len(tail_users) / len(all_users) * 100
 
     top_user_contrib = (
-        tail.groupby("open_type")["duration_sec"].agg(
+        tail.groupby("open_type", observed=True)["duration_sec"].agg(
             count="count",
             sum="sum",
         ).sort_values(by="sum", ascending=False).reset_index()
@@ -109,26 +125,29 @@ def tail_test(episodes_df):
     }
 
 
-def wilcoxon_paired_test(episodes_df):
+def wilcoxon_paired_test(ep_df):
     """
     Compute paired Wilcoxon test on per-user median durations [sec].
-    :param episodes_df: DataFrame containing all episodes.
+    :param ep_df: DataFrame of episodes prepared by _prepare_episodes.
     :return: dict containing 'wilcoxon_pair_test', 'n_paired', 'median_auto_sec', 'median_auto_sec', 'median_log10_diff', 'pivot_auto' and 'pivot_manual'.
     """
-    ep_df = episodes_df.dropna(subset=["user_id", "open_type", "duration_sec"]).copy()
-    per_user = ep_df.groupby(["user_id", "open_type"], as_index=False)["duration_sec"].median()
-    pivot = per_user.pivot(index="user_id", columns="open_type", values="duration_sec").dropna()
-    auto_log10_median = np.log10(pivot["auto"] + 1)
-    manual_log10_median = np.log10(pivot["manual"] + 1)
+    # One per-user median Series per open_type, aligned with an inner join on user_id;
+    # equivalent to the old pivot(...).dropna() without materializing the wide table.
+    per_user = ep_df.groupby(["open_type", "user_id"], observed=True)["duration_sec"].median()
+    paired = pd.concat([per_user.loc["auto"].rename("auto"),
+                        per_user.loc["manual"].rename("manual")],
+                       axis=1, join="inner")
+    auto_log10_median = log10p1(paired["auto"])
+    manual_log10_median = log10p1(paired["manual"])
     wilcoxon_pair_test = stats.wilcoxon(auto_log10_median, manual_log10_median, alternative="two-sided")
     return {
         "wilcoxon_pair_test": wilcoxon_pair_test,
-        "n_paired": pivot.shape[0],
-        "median_auto_sec": np.median(pivot["auto"]),
-        "median_manual_sec": np.median(pivot["manual"]),
+        "n_paired": paired.shape[0],
+        "median_auto_sec": np.median(paired["auto"]),
+        "median_manual_sec": np.median(paired["manual"]),
         "median_log10_diff": np.median(auto_log10_median - manual_log10_median),
-        "pivot_auto": pivot["auto"].values,
-        "pivot_manual": pivot["manual"].values
+        "pivot_auto": paired["auto"].values,
+        "pivot_manual": paired["manual"].values
     }
 
 
@@ -141,26 +160,25 @@ def bootstrap_ci(a, b, n_boot=4000, seed=None):
     :param seed: random seed for reproducibility. defaults to None.
     :return: dict containing 'median_ratio_ci' and 'mean_log10_factor_ci'.
     """
-    rng = np.random.RandomState(seed)
+    rng = np.random.default_rng(seed)
     a = np.asarray(a)
     b = np.asarray(b)
-    a_log10 = np.log10(a + 1)
-    b_log10 = np.log10(b + 1)
+    a_log10 = log10p1(a)
+    b_log10 = log10p1(b)
     if len(a_log10) == 0 or len(b_log10) == 0:
         return None
 
     obs_median = float(np.median(a) / np.median(b))
     obs_mean_log10 = float(10 ** (np.mean(a_log10) - np.mean(b_log10)))
-    boot_median = np.empty(n_boot)
-    boot_mean_log10 = np.empty(n_boot)
-    for i in range(n_boot):
-        a_s_median = rng.choice(a, size=len(a), replace=True)
-        b_s_median = rng.choice(b, size=len(b), replace=True)
-        boot_median[i] = np.median(a_s_median) / np.median(b_s_median)
-
-        a_s_mean_log10 = rng.choice(a_log10, size=len(a_log10), replace=True)
-        b_s_mean_log10 = rng.choice(b_log10, size=len(b_log10), replace=True)
-        boot_mean_log10[i] = 10 ** (np.mean(a_s_mean_log10) - np.mean(b_s_mean_log10))
+    # Draw all resample indices up front and reduce along axis 1, so the whole
+    # bootstrap runs as a handful of vectorized ops instead of n_boot Python iterations.
+    idx_a = rng.integers(0, len(a), size=(n_boot, len(a)))
+    idx_b = rng.integers(0, len(b), size=(n_boot, len(b)))
+    boot_median = np.median(a[idx_a], axis=1) / np.median(b[idx_b], axis=1)
+
+    idx_a_log10 = rng.integers(0, len(a_log10), size=(n_boot, len(a_log10)))
+    idx_b_log10 = rng.integers(0, len(b_log10), size=(n_boot, len(b_log10)))
+    boot_mean_log10 = 10 ** (a_log10[idx_a_log10].mean(axis=1) - b_log10[idx_b_log10].mean(axis=1))
     lower_median, upper_median = np.percentile(boot_median, [2.5, 97.5])
     lower_mean_log10, upper_mean_log10 = np.percentile(boot_mean_log10, [2.5, 97.5])
     return {
@@ -176,17 +194,23 @@ def all_stat_analysis(episodes_df):
     :return: dict encapsulating all statistical analysis results.
     """
     results = {}
+    ep_df = _prepare_episodes(episodes_df)
+
+    # The open_type column is categorical, so these compare int8 codes; computing the
+    # masks once covers every auto/manual selection downstream.
+    is_auto = (ep_df["open_type"] == "auto").to_numpy()
+    is_manual = (ep_df["open_type"] == "manual").to_numpy()
 
-    summaries = stat_summary(episodes_df)
+    summaries = stat_summary(ep_df)
     results.update(summaries)
 
-    inf_test_results = inferential_tests(episodes_df)
+    inf_test_results = inferential_tests(ep_df, is_auto, is_manual)
     results["inf"] = inf_test_results
 
-    tail_results = tail_test(episodes_df)
+    tail_results = tail_test(ep_df)
     results["tail"] = tail_results
 
-    wilcoxon_results = wilcoxon_paired_test(episodes_df)
+    wilcoxon_results = wilcoxon_paired_test(ep_df)
     results["wilcoxon"] = {
         k: v for k, v in wilcoxon_results.items() if k not in ("pivot_auto", "pivot_manual")
     }